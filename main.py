@@ -8,12 +8,16 @@ credit card transactions for fraud indicators.
 import os
 import re
 import logging
-from datetime import datetime
-from typing import Optional
-
-from fastapi import FastAPI, HTTPException, Request
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Annotated, Optional
+
+import httpx
+from fastapi import Body, FastAPI, HTTPException, Request
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel, Field, field_validator
-from openai import OpenAI
+from openai import AsyncOpenAI
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -26,15 +30,101 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Create the OpenAI client and its connection pool for each app lifetime, and
+    close the pool on shutdown. Built here rather than at import so a restart
+    (or a second TestClient) doesn't inherit an already-closed pool.
+    """
+    # Shared connection pool - keepalive connections get reused across requests
+    # so bursts don't pay for a fresh TLS handshake each time
+    http_client = httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=2000, max_keepalive_connections=500),
+        timeout=httpx.Timeout(60.0, connect=5.0),
+    )
+    # Async so LLM calls don't block the event loop
+    app.state.openai_client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), http_client=http_client)
+    try:
+        yield
+    finally:
+        await http_client.aclose()
+
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Fraud Detection API",
     description="Simple fraud analysis using OpenAI GPT-4",
-    version="0.1.0"
+    version="0.1.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
+)
+
+# Upper bound on transactions per /analyze_batch request
+MAX_BATCH_SIZE = 100
+
+# Static instructions sent as the system message. Kept byte-identical so the
+# API's prompt caching can reuse the prefix across requests.
+FRAUD_SYSTEM_PROMPT = """You are a fraud detection expert analyzing a credit card transaction.
+
+Analyze the transaction for fraud indicators. Consider:
+1. Amount appropriateness for category
+2. Unusual location patterns (e.g., high-risk regions)
+3. Merchant reputation concerns
+4. Time-of-day patterns
+5. Round number amounts (common in fraud)
+
+Provide your analysis in this exact format:
+
+RISK_LEVEL: [low/medium/high]
+CONFIDENCE: [low/medium/high]
+REASONING: [2-3 sentences explaining your assessment]
+RED_FLAGS: [comma-separated list of concerns, or "none"]
+RECOMMENDATIONS: [1-2 sentence action recommendation]
+
+Be specific and practical. Focus on concrete indicators."""
+
+# Per-transaction user message, filled in by build_fraud_prompt
+TRANSACTION_PROMPT_TEMPLATE = """Transaction Details:
+- Amount: ${amount:.2f}
+- Merchant: {merchant}
+- Category: {category}
+- Location: {location}
+- Time: {timestamp}
+- Card: ****{card_last_four}"""
+
+# Common prompt injection attempts - compiled once at import, not per request.
+# Joined into a single alternation so sanitizing is one pass over the text.
+_INJECTION_PATTERNS = [
+    r"ignore\s+previous\s+instructions",
+    r"ignore\s+above",
+    r"disregard\s+previous",
+    r"system\s*:",
+    r"assistant\s*:",
+    r"user\s*:",
+]
+_INJECTION_RE = re.compile(
+    "|".join(f"(?:{p})" for p in _INJECTION_PATTERNS), re.IGNORECASE
 )
 
-# Initialize OpenAI client
-openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# Field extractors for the structured LLM response
+_RISK_RE = re.compile(r"RISK_LEVEL:\s*(\w+)", re.IGNORECASE)
+_CONF_RE = re.compile(r"CONFIDENCE:\s*(\w+)", re.IGNORECASE)
+_REASON_RE = re.compile(r"REASONING:\s*(.+?)(?=RED_FLAGS:|$)", re.IGNORECASE | re.DOTALL)
+_FLAGS_RE = re.compile(r"RED_FLAGS:\s*(.+?)(?=RECOMMENDATIONS:|$)", re.IGNORECASE | re.DOTALL)
+_REC_RE = re.compile(r"RECOMMENDATIONS:\s*(.+)", re.IGNORECASE | re.DOTALL)
+
+
+def parse_timestamp(value: str) -> datetime:
+    """
+    Parse an ISO 8601 timestamp. Python 3.11+ accepts a trailing 'Z' directly,
+    so the '+00:00' rewrite (and its string copy) is only a fallback for older versions.
+    """
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
 
 
 class TransactionRequest(BaseModel):
@@ -51,10 +141,12 @@ class TransactionRequest(BaseModel):
     @classmethod
     def validate_card_last_four(cls, v):
         """Only accept last 4 digits (no full card numbers)."""
-        if v and len(v) != 4:
-            raise ValueError("Only last 4 digits of card allowed")
-        if v and not v.isdigit():
-            raise ValueError("Card digits must be numeric")
+        if v:
+            if len(v) != 4:
+                raise ValueError("Only last 4 digits of card allowed")
+            # isdigit() alone also accepts non-ASCII digits like "١٢٣٤"
+            if not (v.isascii() and v.isdigit()):
+                raise ValueError("Card digits must be numeric")
         return v
     
     @field_validator("timestamp")
@@ -62,7 +154,7 @@ class TransactionRequest(BaseModel):
     def validate_timestamp(cls, v):
         """Validate timestamp format."""
         try:
-            datetime.fromisoformat(v.replace('Z', '+00:00'))
+            parse_timestamp(v)
         except ValueError:
             raise ValueError("Invalid timestamp format. Use ISO 8601")
         return v
@@ -78,66 +170,40 @@ class FraudAnalysisResponse(BaseModel):
     recommendations: str
 
 
+@lru_cache(maxsize=8192)
 def sanitize_input(text: str) -> str:
     """
     Basic prompt injection prevention - removes common attack patterns.
-    Not comprehensive, but catches the obvious stuff.
+    Not comprehensive, but catches the obvious stuff. Memoized since merchant,
+    category and location values repeat heavily across transactions.
     """
-    # Filter out common injection attempts
-    injection_patterns = [
-        r"ignore\s+previous\s+instructions",
-        r"ignore\s+above",
-        r"disregard\s+previous",
-        r"system\s*:",
-        r"assistant\s*:",
-        r"user\s*:",
-    ]
-    
-    sanitized = text
-    for pattern in injection_patterns:
-        sanitized = re.sub(pattern, "", sanitized, flags=re.IGNORECASE)
+    # Repeat until nothing matches - removing one pattern can join the text
+    # around it into another (e.g. "usesystem:r:" -> "user:"). Normally one pass.
+    sanitized, count = _INJECTION_RE.subn("", text)
+    while count:
+        sanitized, count = _INJECTION_RE.subn("", sanitized)
     
     return sanitized.strip()
 
 
 def build_fraud_prompt(transaction: TransactionRequest) -> str:
     """
-    Construct the analysis prompt. Took a few iterations to get the format right -
-    being explicit about the output structure made responses way more consistent.
+    Construct the per-transaction user message. The instructions live in
+    FRAUD_SYSTEM_PROMPT so they stay a byte-identical prefix across requests.
     """
     # Clean inputs first
     merchant = sanitize_input(transaction.merchant)
     category = sanitize_input(transaction.category)
     location = sanitize_input(transaction.location)
     
-    prompt = f"""You are a fraud detection expert analyzing a credit card transaction.
-
-Transaction Details:
-- Amount: ${transaction.amount:.2f}
-- Merchant: {merchant}
-- Category: {category}
-- Location: {location}
-- Time: {transaction.timestamp}
-- Card: ****{transaction.card_last_four or 'XXXX'}
-
-Analyze this transaction for fraud indicators. Consider:
-1. Amount appropriateness for category
-2. Unusual location patterns (e.g., high-risk regions)
-3. Merchant reputation concerns
-4. Time-of-day patterns
-5. Round number amounts (common in fraud)
-
-Provide your analysis in this exact format:
-
-RISK_LEVEL: [low/medium/high]
-CONFIDENCE: [low/medium/high]
-REASONING: [2-3 sentences explaining your assessment]
-RED_FLAGS: [comma-separated list of concerns, or "none"]
-RECOMMENDATIONS: [1-2 sentence action recommendation]
-
-Be specific and practical. Focus on concrete indicators."""
-
-    return prompt
+    return TRANSACTION_PROMPT_TEMPLATE.format(
+        amount=transaction.amount,
+        merchant=merchant,
+        category=category,
+        location=location,
+        timestamp=transaction.timestamp,
+        card_last_four=transaction.card_last_four or 'XXXX'
+    )
 
 
 def parse_response(response_text: str) -> dict:
@@ -154,29 +220,29 @@ def parse_response(response_text: str) -> dict:
     }
     
     # Extract risk level
-    risk_match = re.search(r"RISK_LEVEL:\s*(\w+)", response_text, re.IGNORECASE)
+    risk_match = _RISK_RE.search(response_text)
     if risk_match:
         result["risk_level"] = risk_match.group(1).lower()
     
     # Extract confidence
-    conf_match = re.search(r"CONFIDENCE:\s*(\w+)", response_text, re.IGNORECASE)
+    conf_match = _CONF_RE.search(response_text)
     if conf_match:
         result["confidence"] = conf_match.group(1).lower()
     
     # Extract reasoning
-    reason_match = re.search(r"REASONING:\s*(.+?)(?=RED_FLAGS:|$)", response_text, re.IGNORECASE | re.DOTALL)
+    reason_match = _REASON_RE.search(response_text)
     if reason_match:
         result["reasoning"] = reason_match.group(1).strip()
     
     # Extract red flags
-    flags_match = re.search(r"RED_FLAGS:\s*(.+?)(?=RECOMMENDATIONS:|$)", response_text, re.IGNORECASE | re.DOTALL)
+    flags_match = _FLAGS_RE.search(response_text)
     if flags_match:
         flags_text = flags_match.group(1).strip()
         if flags_text.lower() != "none":
             result["red_flags"] = [f.strip() for f in flags_text.split(",") if f.strip()]
     
     # Extract recommendations
-    rec_match = re.search(r"RECOMMENDATIONS:\s*(.+)", response_text, re.IGNORECASE | re.DOTALL)
+    rec_match = _REC_RE.search(response_text)
     if rec_match:
         result["recommendations"] = rec_match.group(1).strip()
     
@@ -213,7 +279,7 @@ def analyze_fraud_mock(transaction: TransactionRequest) -> dict:
     
     # Check time patterns (late night)
     try:
-        dt = datetime.fromisoformat(transaction.timestamp.replace('Z', '+00:00'))
+        dt = parse_timestamp(transaction.timestamp)
         if dt.hour < 6 or dt.hour > 23:
             red_flags.append("Unusual transaction time")
     except:
@@ -255,6 +321,38 @@ def analyze_fraud_mock(transaction: TransactionRequest) -> dict:
     }
 
 
+def run_analysis(transaction: TransactionRequest) -> FraudAnalysisResponse:
+    """
+    Analyze a single transaction and build the response.
+    Shared by the single and batch endpoints.
+    """
+    # Log request (without sensitive data)
+    logger.info(
+        "Analyzing transaction %s - Amount: $%.2f, Category: %s",
+        transaction.transaction_id, transaction.amount, transaction.category
+    )
+    
+    # Run mock analysis
+    analysis = analyze_fraud_mock(transaction)
+    
+    # Build response
+    result = FraudAnalysisResponse(
+        transaction_id=transaction.transaction_id,
+        risk_level=analysis["risk_level"],
+        confidence=analysis["confidence"],
+        reasoning=analysis["reasoning"],
+        red_flags=analysis["red_flags"],
+        recommendations=analysis["recommendations"]
+    )
+    
+    logger.info(
+        "Transaction %s analyzed - Risk: %s, Confidence: %s",
+        transaction.transaction_id, result.risk_level, result.confidence
+    )
+    
+    return result
+
+
 @app.post("/analyze", response_model=FraudAnalysisResponse)
 async def analyze_transaction(transaction: TransactionRequest, request: Request):
     """
@@ -264,46 +362,46 @@ async def analyze_transaction(transaction: TransactionRequest, request: Request)
     Good for demos and understanding the fraud detection patterns.
     """
     try:
-        # Log request (without sensitive data)
-        logger.info(
-            f"Analyzing transaction {transaction.transaction_id} - "
-            f"Amount: ${transaction.amount:.2f}, Category: {transaction.category}"
-        )
-        
-        # Run mock analysis
-        analysis = analyze_fraud_mock(transaction)
-        
-        # Build response
-        result = FraudAnalysisResponse(
-            transaction_id=transaction.transaction_id,
-            risk_level=analysis["risk_level"],
-            confidence=analysis["confidence"],
-            reasoning=analysis["reasoning"],
-            red_flags=analysis["red_flags"],
-            recommendations=analysis["recommendations"]
-        )
-        
-        logger.info(
-            f"Transaction {transaction.transaction_id} analyzed - "
-            f"Risk: {result.risk_level}, Confidence: {result.confidence}"
-        )
-        
-        return result
+        return run_analysis(transaction)
         
     except Exception as e:
-        logger.error(f"Error analyzing transaction {transaction.transaction_id}: {str(e)}", exc_info=True)
+        logger.error("Error analyzing transaction %s: %s", transaction.transaction_id, e, exc_info=True)
         raise HTTPException(
             status_code=500,
             detail=f"Failed to analyze transaction: {str(e)}"
         )
 
 
+@app.post("/analyze_batch", response_model=list[FraudAnalysisResponse])
+async def analyze_batch(
+    transactions: Annotated[list[TransactionRequest], Body(max_length=MAX_BATCH_SIZE)]
+):
+    """
+    Analyze several transactions in one request.
+    
+    Saves a round trip per transaction for clients that score in bulk.
+    Results come back in the same order as the request.
+    """
+    results = []
+    for transaction in transactions:
+        try:
+            results.append(run_analysis(transaction))
+        except Exception as e:
+            logger.error("Error analyzing transaction %s: %s", transaction.transaction_id, e, exc_info=True)
+            raise HTTPException(
+                status_code=500,
+                detail=f"Failed to analyze transaction {transaction.transaction_id}: {str(e)}"
+            )
+    
+    return results
+
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint."""
     health = {
         "status": "healthy",
-        "timestamp": datetime.utcnow().isoformat(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
         "mode": "mock",
         "note": "Using rule-based fraud detection for demo purposes"
     }
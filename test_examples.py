@@ -1,30 +1,42 @@
 """
 Manual testing script for the fraud detection API.
 Start the server (python main.py) then run this to test different scenarios.
+
+The scenario requests are independent, so they're sent concurrently with
+aiohttp (pip install aiohttp) - also a handy example of driving the API
+under concurrency.
 """
 
-import requests
+import asyncio
 import json
-from typing import Dict, Any
+from typing import Dict, Any, Tuple
+
+import aiohttp
 
 API_BASE = "http://localhost:8000"
 
 
-def print_response(title: str, response: Dict[Any, Any]):
 def print_response(title: str, response: Dict[Any, Any]):
     """Print the response nicely."""
+    print(f"\n{'='*60}")
     print(f"{title}")
     print('='*60)
     print(json.dumps(response, indent=2))
 
 
-def test_health():
+async def post_transaction(session: aiohttp.ClientSession, transaction: Dict[str, Any]) -> Dict[Any, Any]:
+    """POST a transaction to /analyze and return the decoded body."""
+    async with session.post(f"{API_BASE}/analyze", json=transaction) as response:
+        return await response.json()
+
+
+async def test_health(session: aiohttp.ClientSession):
     """Check if server is running."""
-    response = requests.get(f"{API_BASE}/health")
-    print_response("Health Check", response.json())
+    async with session.get(f"{API_BASE}/health") as response:
+        print_response("Health Check", await response.json())
 
 
-def test_low_risk_transaction():
+async def test_low_risk_transaction(session: aiohttp.ClientSession) -> Tuple[str, Dict[Any, Any]]:
     """Test a normal, low-risk transaction."""
     transaction = {
         "transaction_id": "txn_low_001",
@@ -35,12 +47,12 @@ def test_low_risk_transaction():
         "timestamp": "2024-12-08T08:15:00Z",
         "card_last_four": "5678"
     }
-    
-    response = requests.post(f"{API_BASE}/analyze", json=transaction)
-    print_response("Low Risk Transaction - Starbucks Purchase", response.json())
+
+    response = await post_transaction(session, transaction)
+    return "Low Risk Transaction - Starbucks Purchase", response
 
 
-def test_medium_risk_transaction():
+async def test_medium_risk_transaction(session: aiohttp.ClientSession) -> Tuple[str, Dict[Any, Any]]:
     """Test a moderately suspicious transaction."""
     transaction = {
         "transaction_id": "txn_med_001",
@@ -51,12 +63,12 @@ def test_medium_risk_transaction():
         "timestamp": "2024-12-08T23:45:00Z",
         "card_last_four": "1234"
     }
-    
-    response = requests.post(f"{API_BASE}/analyze", json=transaction)
-    print_response("Medium Risk Transaction - Late Night International Purchase", response.json())
+
+    response = await post_transaction(session, transaction)
+    return "Medium Risk Transaction - Late Night International Purchase", response
 
 
-def test_high_risk_transaction():
+async def test_high_risk_transaction(session: aiohttp.ClientSession) -> Tuple[str, Dict[Any, Any]]:
     """Test a highly suspicious transaction."""
     transaction = {
         "transaction_id": "txn_high_001",
@@ -67,12 +79,12 @@ def test_high_risk_transaction():
         "timestamp": "2024-12-08T03:00:00Z",
         "card_last_four": "9012"
     }
-    
-    response = requests.post(f"{API_BASE}/analyze", json=transaction)
-    print_response("High Risk Transaction - Large Wire Transfer", response.json())
 
+    response = await post_transaction(session, transaction)
+    return "High Risk Transaction - Large Wire Transfer", response
 
-def test_round_amount_suspicious():
+
+async def test_round_amount_suspicious(session: aiohttp.ClientSession) -> Tuple[str, Dict[Any, Any]]:
     """Test transaction with suspicious round amount."""
     transaction = {
         "transaction_id": "txn_round_001",
@@ -83,12 +95,12 @@ def test_round_amount_suspicious():
         "timestamp": "2024-12-08T02:30:00Z",
         "card_last_four": "3456"
     }
-    
-    response = requests.post(f"{API_BASE}/analyze", json=transaction)
-    print_response("Suspicious Round Amount - Gift Card Purchase", response.json())
+
+    response = await post_transaction(session, transaction)
+    return "Suspicious Round Amount - Gift Card Purchase", response
 
 
-def test_validation_error():
+async def test_validation_error(session: aiohttp.ClientSession):
     """Test validation with invalid card number."""
     transaction = {
         "transaction_id": "txn_invalid_001",
@@ -99,10 +111,10 @@ def test_validation_error():
         "timestamp": "2024-12-08T12:00:00Z",
         "card_last_four": "12345678"  # Invalid: too many digits
     }
-    
+
     try:
-        response = requests.post(f"{API_BASE}/analyze", json=transaction)
-        print_response("Validation Error Test", response.json())
+        response = await post_transaction(session, transaction)
+        print_response("Validation Error Test", response)
     except Exception as e:
         print(f"\n{'='*60}")
         print("Validation Error Test (Expected)")
@@ -110,26 +122,60 @@ def test_validation_error():
         print(f"Error: {e}")
 
 
+def test_sanitize_nested_injection():
+    """
+    Regression check: sanitize_input must not leave behind a pattern formed by
+    stripping another one. Runs locally, no server needed.
+    """
+    from main import sanitize_input
+
+    cases = {
+        "usesystem:r:": "",
+        "sysuser:tem: hello": "hello",
+        "Starbucks": "Starbucks",
+    }
+    failures = {text: sanitize_input(text) for text, expected in cases.items()
+                if sanitize_input(text) != expected}
+
+    print(f"\n{'='*60}")
+    print(f"Nested Injection Sanitizer Check ({'FAIL' if failures else 'PASS'})")
+    print('='*60)
+    for text, result in failures.items():
+        print(f"{text!r} -> {result!r}, expected {cases[text]!r}")
+
+
+async def main():
+    async with aiohttp.ClientSession() as session:
+        # Test health first
+        await test_health(session)
+
+        # Scenarios are independent, so fire them all at once and print in order
+        results = await asyncio.gather(
+            test_low_risk_transaction(session),
+            test_medium_risk_transaction(session),
+            test_high_risk_transaction(session),
+            test_round_amount_suspicious(session),
+        )
+        for title, response in results:
+            print_response(title, response)
+
+        await test_validation_error(session)
+
+
 if __name__ == "__main__":
     print("\nStarting Fraud Detection API Tests")
     print("Make sure the server is running: python main.py\n")
-    
+
+    test_sanitize_nested_injection()
+
     try:
-        # Test health first
-        test_health()
-        
-        # Test various scenarios
-        test_low_risk_transaction()
-        test_medium_risk_transaction()
-        test_high_risk_transaction()
-        test_round_amount_suspicious()
-        test_validation_error()
-        
+        asyncio.run(main())
+
         print("\n" + "="*60)
         print("All tests completed!")
         print("="*60 + "\n")
-        
-    except requests.exceptions.ConnectionError:
+
+    except aiohttp.ClientConnectorError:
         print("\nError: Could not connect to API")
         print("Make sure the server is running: python main.py\n")
     except Exception as e: